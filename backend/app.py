@@ -1,27 +1,93 @@
-from flask import Flask, jsonify, request, g
+from flask import Flask, jsonify, redirect, request, g, send_file
 import psycopg2
-import psycopg2.extras
 from psycopg2 import pool
 from flask_cors import CORS
+import logging
 import os
+import random
+from io import BytesIO
 import sys
-from datetime import date
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "lib"))
-from profile_scraper import scrape_profile
+from filter_compiler import (
+    SORT_MAX_CANDIDATES,
+    compile_filters,
+    count_query,
+    load_value_counts,
+    sampling_query,
+)
+from poster_cache import POSTER_SIZES, cached_poster, fetch_poster, poster_version
+from profile_store import check_schema, save_snapshot
+from similarity import pairwise_similarity
 
 app = Flask(__name__)
 CORS(app)
 
+# Log through the server's configured logger (handlers, level, format) when
+# running under gunicorn or uvicorn.
+for server_logger_name in ("gunicorn.error", "uvicorn.error"):
+    server_logger = logging.getLogger(server_logger_name)
+    if server_logger.handlers:
+        app.logger.handlers = server_logger.handlers
+        app.logger.setLevel(server_logger.level)
+        break
+
 load_dotenv()
 
-db_pool = pool.SimpleConnectionPool(1, 20, os.getenv("DATABASE_URL"))
+db_pool = None
+db_pool_pid = None
+db_pool_lock = threading.Lock()
+
+startup = {"pid": os.getpid(), "started": time.perf_counter(), "first_request_ms": None}
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 3600))
+catalog = {"film_count": None, "value_counts": None, "loaded_at": 0.0}
+catalog_lock = threading.Lock()
+
+SEEN_CACHE_SIZE = 256
+seen_sets = OrderedDict()
+seen_sets_lock = threading.Lock()
+
+scrape_slots = threading.BoundedSemaphore(int(os.getenv("SCRAPE_CONCURRENCY", 4)))
+# A page of cards requests many uncached posters at once, so a fetch waits
+# briefly for a slot before being turned away.
+POSTER_FETCH_WAIT = 10
+poster_fetch_slots = threading.BoundedSemaphore(int(os.getenv("POSTER_FETCH_CONCURRENCY", 4)))
+
+
+def get_pool():
+    global db_pool, db_pool_pid
+    # Created on first use in each process, so a pool opened in the gunicorn
+    # master is never shared with forked workers.
+    if db_pool_pid != os.getpid():
+        with db_pool_lock:
+            if db_pool_pid != os.getpid():
+                new_pool = pool.ThreadedConnectionPool(
+                    1,
+                    int(os.getenv("DB_POOL_MAX", 20)),
+                    os.getenv("DATABASE_URL"),
+                )
+                conn = new_pool.getconn()
+                try:
+                    with conn.cursor() as cur:
+                        check_schema(cur)
+                    conn.rollback()
+                except Exception:
+                    new_pool.closeall()
+                    raise
+                new_pool.putconn(conn)
+                db_pool = new_pool
+                db_pool_pid = os.getpid()
+    return db_pool
 
 
 def get_db():
     if "db" not in g:
-        g.db = db_pool.getconn()
+        g.db = get_pool().getconn()
     return g.db
 
 
@@ -29,18 +95,116 @@ def get_db():
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db_pool.putconn(db)
+        get_pool().putconn(db)
 
 
-@app.route("/")
-def hello():
-    conn = get_db()
-    cur = conn.cursor()
+def reset_after_fork():
+    startup["pid"] = os.getpid()
+    startup["started"] = time.perf_counter()
+    startup["first_request_ms"] = None
+
 
+@app.before_request
+def record_first_request():
+    if startup["first_request_ms"] is None:
+        startup["first_request_ms"] = round((time.perf_counter() - startup["started"]) * 1000)
+        app.logger.info(
+            "worker %s: first request %d ms after start", startup["pid"], startup["first_request_ms"]
+        )
+
+
+def load_catalog(cur):
     cur.execute("SELECT COUNT(*) FROM films")
-    count = cur.fetchone()[0]
+    catalog["film_count"] = cur.fetchone()[0]
+    catalog["value_counts"] = load_value_counts(cur)
+    catalog["loaded_at"] = time.time()
+
+
+def refresh_catalog(cur):
+    if time.time() - catalog["loaded_at"] <= CATALOG_CACHE_TTL:
+        return
+    # One thread reloads a stale catalog while the others keep using the old
+    # stats; only a worker that has never loaded it waits.
+    if not catalog_lock.acquire(blocking=catalog["value_counts"] is None):
+        return
+    try:
+        if time.time() - catalog["loaded_at"] > CATALOG_CACHE_TTL:
+            load_catalog(cur)
+    finally:
+        catalog_lock.release()
 
+
+def warmup():
+    started = time.perf_counter()
+    # A direct connection rather than the pool, so warming up in the gunicorn
+    # master leaves no connections behind for forked workers to inherit.
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    cur = conn.cursor()
+    check_schema(cur)
+    load_catalog(cur)
     cur.close()
+    conn.close()
+    return round((time.perf_counter() - started) * 1000)
+
+
+def film_json(columns, row):
+    film = dict(zip(columns, row))
+    film["poster_version"] = poster_version(film["image"]) if film.get("image") else None
+    return film
+
+
+def latest_profiles(cur, usernames):
+    cur.execute(
+        """
+        SELECT p.id, p.username, p.scraped_date, p.total_films, l.updated_at
+        FROM profile_latest l
+        JOIN profiles p ON p.id = l.profile_id
+        WHERE l.username = ANY(%s)
+        """,
+        (list(usernames),),
+    )
+    return {row[1]: row for row in cur.fetchall()}
+
+
+def seen_film_ids(cur, username):
+    cur.execute(
+        """
+        SELECT f.id
+        FROM profile_current pc
+        JOIN films f ON f.url = 'https://letterboxd.com/film/' || pc.film_slug || '/'
+        WHERE pc.username = %s
+        ORDER BY f.id
+        """,
+        (username,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def cache_seen_set(username, version, film_ids):
+    with seen_sets_lock:
+        seen_sets[username] = (version, film_ids)
+        seen_sets.move_to_end(username)
+        while len(seen_sets) > SEEN_CACHE_SIZE:
+            seen_sets.popitem(last=False)
+
+
+def profile_seen_set(cur, username, version):
+    cached = seen_sets.get(username)
+    if cached is None or cached[0] != version:
+        film_ids = seen_film_ids(cur, username)
+    else:
+        film_ids = cached[1]
+    cache_seen_set(username, version, film_ids)
+    return film_ids
+
+
+@app.route("/")
+def hello():
+    if time.time() - catalog["loaded_at"] > CATALOG_CACHE_TTL:
+        cur = get_db().cursor()
+        refresh_catalog(cur)
+        cur.close()
+    count = catalog["film_count"]
 
     return jsonify(
         {
@@ -55,7 +219,7 @@ def get_films():
     cur = conn.cursor()
     cur.execute("SELECT * FROM films LIMIT 20")
     columns = [desc[0] for desc in cur.description]
-    films = [dict(zip(columns, row)) for row in cur.fetchall()]
+    films = [film_json(columns, row) for row in cur.fetchall()]
     cur.close()
     return jsonify(films)
 
@@ -70,7 +234,60 @@ def get_film(film_id):
     cur.close()
     if not row:
         return jsonify({"error": "Film not found"}), 404
-    return jsonify(dict(zip(columns, row)))
+    return jsonify(film_json(columns, row))
+
+
+@app.route("/films/<int:film_id>/poster")
+def film_poster(film_id):
+    size = request.args.get("size", "card")
+    if size not in POSTER_SIZES:
+        return jsonify({"error": f"Unknown size, expected one of {sorted(POSTER_SIZES)}"}), 400
+
+    # v= is the hash of the poster's source URL, so a versioned response can be
+    # cached forever; a catalog refresh that changes the image changes v. A
+    # malformed v misses the cache and is redirected like a stale one.
+    version = request.args.get("v")
+    path = cached_poster(film_id, version, size) if version else None
+    data = None
+    if path is None:
+        conn = get_db()
+        cur = conn.cursor()
+        cur.execute("SELECT image FROM films WHERE id = %s", (film_id,))
+        row = cur.fetchone()
+        cur.close()
+        # Nothing below needs the database, so don't hold a pooled connection
+        # through the outbound fetch.
+        close_db()
+        if not row or not row[0]:
+            return jsonify({"error": "Poster not found"}), 404
+
+        current = poster_version(row[0])
+        if version and version != current:
+            return redirect(f"/films/{film_id}/poster?size={size}&v={current}")
+        path = cached_poster(film_id, current, size)
+        if path is None:
+            if not poster_fetch_slots.acquire(timeout=POSTER_FETCH_WAIT):
+                return jsonify({"error": "Too many poster fetches in progress"}), 503, {"Retry-After": "5"}
+            try:
+                data = fetch_poster(film_id, row[0])[size]
+            except Exception as e:
+                return jsonify({"error": f"Poster fetch failed: {e}"}), 502
+            finally:
+                poster_fetch_slots.release()
+        version = version or current
+
+    if data is not None:
+        response = send_file(BytesIO(data), mimetype="image/jpeg")
+    else:
+        response = send_file(path, mimetype="image/jpeg")
+    response.set_etag(f"{version}-{size}")
+    response.cache_control.public = True
+    if request.args.get("v"):
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 86400
+    return response.make_conditional(request)
 
 
 @app.route("/films/random")
@@ -78,99 +295,63 @@ def random_film():
     conn = get_db()
     cur = conn.cursor()
 
-    conditions = []
-    params = []
     films_limit = request.args.get("limit", 50, type=int)
     films_limit = max(1, min(films_limit, 200))
 
-    min_rating = request.args.get("min_rating", type=float)
-    if min_rating is not None:
-        conditions.append("rating >= %s")
-        params.append(min_rating)
-
-    max_rating = request.args.get("max_rating", type=float)
-    if max_rating is not None:
-        conditions.append("rating <= %s")
-        params.append(max_rating)
-
-    min_ratings = request.args.get("min_ratings", type=int)
-    if min_ratings is not None:
-        conditions.append("rating_count >= %s")
-        params.append(min_ratings)
-
-    year_min = request.args.get("year_min", type=int)
-    if year_min is not None:
-        conditions.append("CAST(year AS INT) >= %s")
-        params.append(year_min)
-
-    year_max = request.args.get("year_max", type=int)
-    if year_max is not None:
-        conditions.append("CAST(year AS INT) <= %s")
-        params.append(year_max)
-
-    genres = request.args.getlist("genre")
-    if genres:
-        genre_mode = request.args.get("genre_mode", "and")
-        if genre_mode == "or":
-            conditions.append("genres && %s")
+    filters = {
+        "min_rating": request.args.get("min_rating", type=float),
+        "max_rating": request.args.get("max_rating", type=float),
+        "min_ratings": request.args.get("min_ratings", type=int),
+        "year_min": request.args.get("year_min", type=int),
+        "year_max": request.args.get("year_max", type=int),
+        "genres": request.args.getlist("genre"),
+        "genre_mode": request.args.get("genre_mode", "and"),
+        "countries": request.args.getlist("country"),
+        "actors": request.args.getlist("actor"),
+        "directors": request.args.getlist("director"),
+    }
+
+    usernames = request.args.getlist("username") + request.args.getlist("unseen_by")
+    if usernames:
+        profiles = latest_profiles(cur, usernames)
+        missing = [u for u in usernames if u not in profiles]
+        if missing:
+            cur.close()
+            return jsonify({"error": "User not found", "missing": missing}), 404
+        seen_lists = [profile_seen_set(cur, u, row[4]) for u, row in profiles.items()]
+        filters["exclude"] = seen_lists[0] if len(seen_lists) == 1 else sorted(set().union(*seen_lists))
+
+    refresh_catalog(cur)
+
+    shape, params, estimate = compile_filters(cur, filters, catalog)
+
+    if estimate > SORT_MAX_CANDIDATES:
+        strategy = "sample"
+    else:
+        if any(shape):
+            cur.execute(count_query(shape), params)
+            count = cur.fetchone()[0]
         else:
-            conditions.append("genres @> %s")
-        params.append(genres)
-
-    countries = request.args.getlist("country")
-    if countries:
-        conditions.append("countries @> %s")
-        params.append(countries)
-
-    actors = request.args.getlist("actor")
-    if actors:
-        conditions.append(
-            """
-            id IN (
-                SELECT fa.film_id
-                FROM film_actors fa
-                INNER JOIN actors a ON fa.actor_id = a.id
-                WHERE a.name = ANY(%s)
-                GROUP BY fa.film_id
-                HAVING COUNT(DISTINCT a.name) = %s
-            )
-        """
-        )
-        params.append(actors)
-        params.append(len(actors))
+            count = catalog["film_count"]
+        if not count:
+            cur.close()
+            return jsonify({"error": "No films match filters"}), 404
+        strategy = "all" if count <= films_limit else "sort"
 
-    directors = request.args.getlist("director")
-    if directors:
-        conditions.append(
-            """
-            id IN (
-                SELECT fd.film_id
-                FROM film_directors fd
-                INNER JOIN directors d ON fd.director_id = d.id
-                WHERE d.name = ANY(%s)
-                GROUP BY fd.film_id
-                HAVING COUNT(DISTINCT d.name) = %s
-            )
-        """
-        )
-        params.append(directors)
-        params.append(len(directors))
-
-    query = "SELECT * FROM films"
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    query += " ORDER BY RANDOM() LIMIT %s"
-    params.append(films_limit)
-
-    cur.execute(query, params)
-    columns = [desc[0] for desc in cur.description]
+    cur.execute(*sampling_query(strategy, shape, params, estimate, films_limit))
     rows = cur.fetchall()
+    if strategy == "sample" and len(rows) < films_limit:
+        cur.execute(*sampling_query("sort", shape, params, estimate, films_limit))
+        rows = cur.fetchall()
+    columns = [desc[0] for desc in cur.description]
     cur.close()
 
     if not rows:
         return jsonify({"error": "No films match filters"}), 404
+    if strategy == "all":
+        random.shuffle(rows)
 
-    return jsonify([dict(zip(columns, row)) for row in rows])
+    return jsonify([film_json(columns, row) for row in rows])
 
 
 @app.route("/actors/search")
@@ -249,53 +430,36 @@ def fetch_directors():
 def get_profile(username):
     conn = get_db()
     cur = conn.cursor()
-    cur.execute(
-        "SELECT username, scraped_date FROM profiles WHERE username = %s ORDER BY scraped_date DESC LIMIT 1",
-        (username,),
-    )
-    row = cur.fetchone()
+    row = latest_profiles(cur, [username]).get(username)
     cur.close()
     if not row:
         return jsonify({"error": "User not found"}), 404
-    return jsonify({"username": row[0], "last_updated": row[1].isoformat()})
+    return jsonify({"username": row[1], "last_updated": row[2].isoformat()})
 
 
 @app.route("/profile/<username>/update", methods=["POST"])
 def update_profile(username):
+    if not scrape_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many profile updates in progress"}), 503, {"Retry-After": "30"}
     try:
+        from profile_scraper import scrape_profile
+
         total_films, movies = scrape_profile(username)
     except Exception as e:
         return jsonify({"error": f"Scrape failed: {e}"}), 502
+    finally:
+        scrape_slots.release()
 
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute(
-        "SELECT id FROM profiles WHERE username = %s AND scraped_date = %s",
-        (username, date.today()),
-    )
-    existing = cur.fetchone()
-
-    if existing:
-        profile_id = existing[0]
-        cur.execute("UPDATE profiles SET total_films = %s WHERE id = %s", (total_films, profile_id))
-        cur.execute("DELETE FROM profile_films WHERE profile_id = %s", (profile_id,))
-    else:
-        cur.execute(
-            "INSERT INTO profiles (username, scraped_date, total_films) VALUES (%s, %s, %s) RETURNING id",
-            (username, date.today(), total_films),
-        )
-        profile_id = cur.fetchone()[0]
-
-    psycopg2.extras.execute_values(
-        cur,
-        "INSERT INTO profile_films (profile_id, film_slug, rating) VALUES %s",
-        [(profile_id, m["film"], m["rating"]) for m in movies],
-    )
+    _, changes = save_snapshot(cur, username, total_films, movies)
     conn.commit()
+    version = latest_profiles(cur, [username])[username][4]
+    cache_seen_set(username, version, seen_film_ids(cur, username))
     cur.close()
 
-    return jsonify({"username": username, "total_films": total_films, "films_scraped": len(movies)})
+    return jsonify({"username": username, "total_films": total_films, "films_scraped": len(movies), "changes": changes})
 
 
 @app.route("/profile/<username>/compare")
@@ -303,44 +467,40 @@ def compare_profile(username):
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute(
-        "SELECT id, total_films, scraped_date FROM profiles WHERE username = %s ORDER BY scraped_date DESC LIMIT 1",
-        (username,),
-    )
-    row = cur.fetchone()
+    row = latest_profiles(cur, [username]).get(username)
     if not row:
         cur.close()
         return jsonify({"error": "User not found"}), 404
 
-    profile_id, total_films, scraped_date = row
+    _, _, scraped_date, total_films, _ = row
 
     cur.execute(
         """
-        SELECT pf.film_slug, pf.rating, f.title, f.rating AS db_rating
-        FROM profile_films pf
-        JOIN films f ON f.url = 'https://letterboxd.com/film/' || pf.film_slug || '/'
-        WHERE pf.profile_id = %s
-          AND pf.rating IS NOT NULL
+        SELECT pc.film_slug, pc.rating, f.title, f.rating AS db_rating
+        FROM profile_current pc
+        JOIN films f ON f.url = 'https://letterboxd.com/film/' || pc.film_slug || '/'
+        WHERE pc.username = %s
+          AND pc.rating IS NOT NULL
           AND f.rating IS NOT NULL
         """,
-        (profile_id,),
+        (username,),
     )
     film_rows = cur.fetchall()
 
     cur.execute(
         """
-        SELECT d.name, elem->>'id' AS slug, pf.film_slug
-        FROM profile_films pf
-        JOIN films f ON f.url = 'https://letterboxd.com/film/' || pf.film_slug || '/'
+        SELECT d.name, elem->>'id' AS slug, pc.film_slug
+        FROM profile_current pc
+        JOIN films f ON f.url = 'https://letterboxd.com/film/' || pc.film_slug || '/'
         JOIN film_directors fd ON fd.film_id = f.id
         JOIN directors d ON d.id = fd.director_id
         JOIN LATERAL jsonb_array_elements(f.directors::jsonb) AS elem
           ON (elem->>'name') = d.name
-        WHERE pf.profile_id = %s
-          AND pf.rating IS NOT NULL
+        WHERE pc.username = %s
+          AND pc.rating IS NOT NULL
           AND f.rating IS NOT NULL
         """,
-        (profile_id,),
+        (username,),
     )
     director_rows = cur.fetchall()
     cur.close()
@@ -389,5 +549,96 @@ def compare_profile(username):
     })
 
 
+@app.route("/profile/<username>/history")
+def profile_history(username):
+    conn = get_db()
+    cur = conn.cursor()
+
+    conditions = ["p.username = %s"]
+    params = [username]
+
+    film = request.args.get("film")
+    if film:
+        conditions.append("e.film_slug = %s")
+        params.append(film)
+
+    event = request.args.get("event")
+    if event:
+        conditions.append("e.event = %s")
+        params.append(event)
+
+    cur.execute(
+        """
+        SELECT p.scraped_date, e.film_slug, e.event, e.old_rating, e.new_rating
+        FROM profile_events e
+        JOIN profiles p ON p.id = e.profile_id
+        WHERE """
+        + " AND ".join(conditions)
+        + " ORDER BY p.scraped_date, e.id",
+        params,
+    )
+    rows = cur.fetchall()
+    cur.close()
+
+    return jsonify({
+        "username": username,
+        "events": [
+            {
+                "date": scraped_date.isoformat(),
+                "film_slug": slug,
+                "event": event_type,
+                "old_rating": old_rating,
+                "new_rating": new_rating,
+            }
+            for scraped_date, slug, event_type, old_rating, new_rating in rows
+        ],
+    })
+
+
+@app.route("/profiles/compare")
+def compare_profiles():
+    usernames = list(dict.fromkeys(request.args.getlist("username")))
+    if len(usernames) < 2:
+        return jsonify({"error": "At least two usernames are required"}), 400
+    if len(usernames) > 10:
+        return jsonify({"error": "At most 10 usernames can be compared"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    profiles = latest_profiles(cur, usernames)
+    missing = [u for u in usernames if u not in profiles]
+    if missing:
+        cur.close()
+        return jsonify({"error": "User not found", "missing": missing}), 404
+
+    cur.execute(
+        "SELECT username, film_slug, rating FROM profile_current WHERE username = ANY(%s)",
+        (usernames,),
+    )
+    seen = {username: set() for username in usernames}
+    ratings = {username: {} for username in usernames}
+    for username, slug, rating in cur.fetchall():
+        seen[username].add(slug)
+        if rating is not None:
+            ratings[username][slug] = rating
+    cur.close()
+
+    return jsonify({
+        "users": [
+            {
+                "username": username,
+                "scraped_date": profiles[username][2].isoformat(),
+                "total_films": profiles[username][3],
+                "rated": len(ratings[username]),
+            }
+            for username in usernames
+        ],
+        "seen_by_all": len(set.intersection(*seen.values())),
+        "seen_by_any": len(set.union(*seen.values())),
+        "pairs": pairwise_similarity(ratings),
+    })
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", 10000)))
@@ -0,0 +1,12 @@
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app, warmup
+
+# Each request runs on this thread pool, off the event loop. Keep it at or
+# below DB_POOL_MAX so every thread can hold a connection.
+application = WSGIMiddleware(app, workers=int(os.getenv("ASGI_THREADS", 16)))
+
+if os.getenv("WARMUP", "1") == "1":
+    warmup()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p95 slowdown (0.10 = 10%%)")
+    parser.add_argument(
+        "--rate-threshold",
+        type=float,
+        default=0.01,
+        help="allowed rise in the non-2xx rate, in absolute terms (0.01 = 1 point)",
+    )
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    print(f"{baseline['revision']} -> {candidate['revision']}\n")
+    print(f"{'Scenario':<20} {'Req/s':>17} {'p95 (change)':>27} {'p99':>20} {'Non-2xx':>17}")
+    print("-" * 105)
+
+    regressions = []
+    for name, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old or not old["p95"] or not new["p95"]:
+            print(f"{name:<20} (no baseline)")
+            continue
+
+        change = new["p95"] / old["p95"] - 1
+        # Older result files predate the non-2xx columns.
+        old_rate = old.get("non_2xx_rate", 0.0)
+        new_rate = new.get("non_2xx_rate", 0.0)
+        if (
+            change > args.threshold
+            or new["errors"] > old["errors"]
+            or new_rate - old_rate > args.rate_threshold
+        ):
+            regressions.append(name)
+        print(
+            f"{name:<20} {old['throughput']:>7.1f} -> {new['throughput']:>6.1f} "
+            f"{old['p95']:>7.1f} -> {new['p95']:>7.1f}ms {change:>+5.0%} "
+            f"{old['p99']:>7.1f} -> {new['p99']:>7.1f}ms "
+            f"{old_rate:>6.1%} -> {new_rate:>6.1%}"
+            + ("  REGRESSION" if name in regressions else "")
+        )
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
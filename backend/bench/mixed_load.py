@@ -0,0 +1,78 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FAST_PATHS = [
+    "/films/random?limit=50",
+    "/films/random?genre=Horror&min_rating=3.5&limit=50",
+    "/actors/search?q=to",
+    "/directors/search?q=ak",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def fast_reader(base_url, deadline, latencies, errors, non_2xx):
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + random.choice(FAST_PATHS), timeout=30)
+            if not 200 <= response.status_code < 300:
+                non_2xx.append(response.status_code)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except requests.RequestException as e:
+            errors.append(str(e))
+            non_2xx.append(None)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def slow_updater(base_url, deadline, username):
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        try:
+            session.post(f"{base_url}/profile/{username}/update", timeout=300)
+        except requests.RequestException:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure fast-read latency while profile updates are in flight."
+    )
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--update", action="append", default=[], metavar="USERNAME")
+    args = parser.parse_args()
+
+    deadline = time.monotonic() + args.duration
+    latencies = []
+    errors = []
+    non_2xx = []
+
+    with ThreadPoolExecutor(max_workers=args.readers + len(args.update)) as executor:
+        for username in args.update:
+            executor.submit(slow_updater, args.url, deadline, username)
+        for _ in range(args.readers):
+            executor.submit(fast_reader, args.url, deadline, latencies, errors, non_2xx)
+
+    print(f"requests: {len(latencies)}  errors: {len(errors)}  slow updaters: {len(args.update)}")
+    print(f"non-2xx: {len(non_2xx)} ({len(non_2xx) / max(len(latencies), 1):.1%})")
+    print(f"throughput: {len(latencies) / args.duration:.1f} req/s")
+    for p in (50, 95, 99):
+        value = percentile(latencies, p)
+        print(f"p{p}: {value:.1f} ms" if value is not None else f"p{p}: -")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import psycopg2
+import requests
+
+from mixed_load import percentile
+from synth import bench_database_url, load_filter_constants
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+from poster_cache import CACHE_DIR, POSTER_SIZES, poster_path, poster_version
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+POSTER_SAMPLE = 500
+# Stand-in for a resized poster; the cache-hit path only streams bytes.
+PLACEHOLDER_POSTER = b"\xff\xd8\xff\xe0" + bytes(8 * 1024) + b"\xff\xd9"
+
+
+def load_samples(cur):
+    cur.execute("SELECT name FROM actor_film_counts ORDER BY film_count DESC LIMIT 2000")
+    actors = [row[0] for row in cur.fetchall()]
+    cur.execute("SELECT name FROM director_film_counts ORDER BY film_count DESC LIMIT 500")
+    directors = [row[0] for row in cur.fetchall()]
+    cur.execute("SELECT username FROM profile_latest")
+    usernames = [row[0] for row in cur.fetchall()]
+    cur.execute("SELECT MAX(id) FROM films")
+    max_film_id = cur.fetchone()[0]
+    cur.execute(
+        "SELECT id, image FROM films WHERE image IS NOT NULL ORDER BY RANDOM() LIMIT %s",
+        (POSTER_SAMPLE,),
+    )
+    posters = [(film_id, poster_version(image)) for film_id, image in cur.fetchall()]
+    return actors, directors, usernames, max_film_id, posters
+
+
+def seed_poster_cache(posters):
+    # The synthetic image URLs don't resolve, so write placeholder variants
+    # where the server looks for them (same POSTER_CACHE_DIR) and benchmark
+    # only the cache-hit path, with no outbound I/O.
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for film_id, version in posters:
+        for size in POSTER_SIZES:
+            path = poster_path(film_id, version, size)
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(PLACEHOLDER_POSTER)
+
+
+def roulette_filters(rng, genres, countries, actors, directors):
+    # Mirrors what the Roulette filter panel sends: each control is set
+    # independently, most spins use only one or two of them.
+    params = [("limit", 50)]
+    if rng.random() < 0.4:
+        params.append(("min_rating", rng.choice([2.5, 3.0, 3.5, 3.8, 4.0])))
+    if rng.random() < 0.1:
+        params.append(("max_rating", rng.choice([2.0, 3.0, 4.0])))
+    if rng.random() < 0.3:
+        params.append(("min_ratings", rng.choice([100, 1000, 10000])))
+    if rng.random() < 0.3:
+        decade = rng.randrange(1920, 2030, 10)
+        params += [("year_min", decade), ("year_max", decade + 9)]
+    if rng.random() < 0.5:
+        picked = rng.sample(genres, rng.choice([1, 1, 2, 3]))
+        params += [("genre", g) for g in picked]
+        if len(picked) > 1:
+            params.append(("genre_mode", rng.choice(["and", "or"])))
+    if rng.random() < 0.2:
+        params.append(("country", rng.choice(countries)))
+    if actors and rng.random() < 0.15:
+        params += [("actor", a) for a in rng.sample(actors[:200], rng.choice([1, 1, 2]))]
+    if directors and rng.random() < 0.1:
+        params.append(("director", rng.choice(directors)))
+    return params
+
+
+def scenarios(genres, countries, actors, directors, usernames, max_film_id, posters):
+    def prefix(names):
+        return lambda rng: "?" + urlencode({"q": rng.choice(names)[: rng.randint(2, 4)]})
+
+    def user(rng):
+        return rng.choice(usernames)
+
+    def poster(rng):
+        film_id, version = rng.choice(posters)
+        return f"/films/{film_id}/poster?" + urlencode({"size": rng.choice(list(POSTER_SIZES)), "v": version})
+
+    return {
+        "home": lambda rng: "/",
+        "films": lambda rng: "/films",
+        "random_unfiltered": lambda rng: "/films/random?limit=50",
+        "random_filtered": lambda rng: "/films/random?"
+        + urlencode(roulette_filters(rng, genres, countries, actors, directors)),
+        "random_broad": lambda rng: "/films/random?"
+        + urlencode([("limit", 50), ("min_rating", rng.choice([2.0, 2.5, 3.0]))]),
+        "random_username_only": lambda rng: "/films/random?"
+        + urlencode([("limit", 50), ("username", user(rng))]),
+        "random_unseen": lambda rng: "/films/random?"
+        + urlencode(roulette_filters(rng, genres, countries, actors, directors) + [("username", user(rng))]),
+        "film": lambda rng: f"/films/{rng.randint(1, max_film_id)}",
+        "poster_cached": poster,
+        "actors_search": lambda rng: "/actors/search" + prefix(actors)(rng),
+        "directors_search": lambda rng: "/directors/search" + prefix(directors)(rng),
+        "profile": lambda rng: f"/profile/{user(rng)}",
+        "profile_compare": lambda rng: f"/profile/{user(rng)}/compare",
+        "profile_history": lambda rng: f"/profile/{user(rng)}/history",
+        "profiles_compare": lambda rng: "/profiles/compare?"
+        + urlencode([("username", u) for u in rng.sample(usernames, rng.randint(2, 4))]),
+    }
+
+
+def drive(base_url, make_path, duration, concurrency, seed):
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = []
+    non_2xx = []
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + make_path(rng), timeout=60)
+                if not 200 <= response.status_code < 300:
+                    non_2xx.append(response.status_code)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+            except requests.RequestException as e:
+                errors.append(str(e))
+                non_2xx.append(None)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(concurrency):
+            executor.submit(worker, seed + i)
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        # 404s from over-narrow filters, 503s from shed load and so on; a
+        # scenario whose fast path starts failing looks faster, not slower.
+        "non_2xx": len(non_2xx),
+        "non_2xx_rate": round(len(non_2xx) / len(latencies), 4) if latencies else 0.0,
+        "throughput": round(len(latencies) / duration, 1),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def git_revision():
+    root = os.path.join(os.path.dirname(__file__), "..", "..")
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root, text=True).strip()
+        dirty = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty.strip() else sha
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint against the synthetic catalog.")
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--duration", type=int, default=20, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", action="append", default=[], metavar="SCENARIO")
+    parser.add_argument("--output", help="defaults to results/<git revision>.json")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(bench_database_url())
+    cur = conn.cursor()
+    actors, directors, usernames, max_film_id, posters = load_samples(cur)
+    cur.close()
+    conn.close()
+
+    genres, countries = load_filter_constants()
+    all_scenarios = scenarios(genres, countries, actors, directors, usernames, max_film_id, posters)
+    selected = args.only or list(all_scenarios)
+    if "poster_cached" in selected:
+        seed_poster_cache(posters)
+
+    revision = git_revision()
+    results = {}
+    print(f"{'Scenario':<20} {'Req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'Errors':>7} {'Non-2xx':>8}")
+    print("-" * 72)
+    for name in selected:
+        r = drive(args.url, all_scenarios[name], args.duration, args.concurrency, args.seed)
+        results[name] = r
+        print(
+            f"{name:<20} {r['throughput']:>8.1f} {r['p50'] or 0:>7.1f}ms {r['p95'] or 0:>7.1f}ms "
+            f"{r['p99'] or 0:>7.1f}ms {r['errors']:>7} {r['non_2xx_rate']:>8.1%}"
+        )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "revision": revision,
+                "duration": args.duration,
+                "concurrency": args.concurrency,
+                "scenarios": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nSaved results to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+CREATE TABLE IF NOT EXISTS films (
+    id SERIAL PRIMARY KEY,
+    title TEXT,
+    year TEXT,
+    directors JSONB,
+    actors JSONB,
+    studios JSONB,
+    genres TEXT[],
+    countries TEXT[],
+    rating REAL,
+    rating_count INTEGER,
+    review_count INTEGER,
+    description TEXT,
+    url TEXT,
+    image TEXT
+);
+
+CREATE TABLE IF NOT EXISTS actors (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS directors (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS film_actors (
+    film_id INTEGER NOT NULL REFERENCES films(id),
+    actor_id INTEGER NOT NULL REFERENCES actors(id),
+    PRIMARY KEY (film_id, actor_id)
+);
+
+CREATE TABLE IF NOT EXISTS film_directors (
+    film_id INTEGER NOT NULL REFERENCES films(id),
+    director_id INTEGER NOT NULL REFERENCES directors(id),
+    PRIMARY KEY (film_id, director_id)
+);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id SERIAL PRIMARY KEY,
+    username TEXT NOT NULL,
+    scraped_date DATE NOT NULL,
+    total_films INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS profile_films (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id),
+    film_slug TEXT NOT NULL,
+    rating REAL
+);
+
+CREATE INDEX IF NOT EXISTS films_url_idx ON films (url);
+CREATE INDEX IF NOT EXISTS films_genres_idx ON films USING GIN (genres);
+CREATE INDEX IF NOT EXISTS films_countries_idx ON films USING GIN (countries);
+CREATE INDEX IF NOT EXISTS actors_name_idx ON actors (name);
+CREATE INDEX IF NOT EXISTS directors_name_idx ON directors (name);
+CREATE INDEX IF NOT EXISTS film_actors_actor_id_idx ON film_actors (actor_id);
+CREATE INDEX IF NOT EXISTS film_directors_director_id_idx ON film_directors (director_id);
+CREATE INDEX IF NOT EXISTS profiles_username_idx ON profiles (username, scraped_date);
+CREATE INDEX IF NOT EXISTS profile_films_profile_id_idx ON profile_films (profile_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS actor_film_counts AS
+    SELECT a.id, a.name, COUNT(*) AS film_count
+    FROM actors a
+    JOIN film_actors fa ON fa.actor_id = a.id
+    GROUP BY a.id, a.name
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS director_film_counts AS
+    SELECT d.id, d.name, COUNT(*) AS film_count, AVG(f.rating) AS avg_rating
+    FROM directors d
+    JOIN film_directors fd ON fd.director_id = d.id
+    JOIN films f ON f.id = fd.film_id
+    GROUP BY d.id, d.name
+WITH NO DATA;
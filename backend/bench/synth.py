@@ -0,0 +1,240 @@
+import argparse
+import io
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+from profile_store import diff_snapshot, ensure_schema, mark_schema_version, write_events
+
+BENCH_DIR = os.path.dirname(__file__)
+CONSTANTS_FILE = os.path.join(BENCH_DIR, "..", "..", "frontend", "src", "constants.ts")
+DEFAULT_DATABASE_URL = "postgresql://localhost/lb_roulette_bench"
+
+SYLLABLES = [
+    "an", "ber", "ca", "dra", "el", "fi", "gor", "ha", "is", "jo", "ka", "li",
+    "ma", "no", "or", "pe", "qui", "ro", "sa", "to", "ul", "ve", "wi", "ya", "zo",
+]
+COMMON_COUNTRIES = ["USA", "UK", "France", "Japan", "Germany", "Italy", "Canada", "South Korea"]
+
+
+def bench_database_url():
+    return os.getenv("BENCH_DATABASE_URL", DEFAULT_DATABASE_URL)
+
+
+def load_filter_constants():
+    with open(CONSTANTS_FILE) as f:
+        source = f.read()
+    constants = {}
+    for name in ("ALL_GENRES", "ALL_COUNTRIES"):
+        body = re.search(rf"{name} = \[(.*?)\];", source, re.S).group(1)
+        constants[name] = re.findall(r'"([^"]+)"', body)
+    return constants["ALL_GENRES"], constants["ALL_COUNTRIES"]
+
+
+def make_name(rng):
+    def word():
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+    return f"{word()} {word()}"
+
+
+def slugify(name, i):
+    return f"{name.lower().replace(' ', '-')}-{i}"
+
+
+def zipf_weights(n, s=1.1):
+    return list(accumulate(1 / math.pow(rank, s) for rank in range(1, n + 1)))
+
+
+def copy_rows(cur, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_value(v) for v in row) + "\n")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        return "{" + ",".join('"' + v.replace('"', '\\\\"') + '"' for v in value) + "}"
+    return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+
+def reset(cur):
+    cur.execute(
+        """
+        DROP MATERIALIZED VIEW IF EXISTS actor_film_counts, director_film_counts;
+        DROP TABLE IF EXISTS schema_version, profile_events, profile_current, profile_latest,
+            profile_films, profiles, film_actors, film_directors, actors, directors, films;
+        """
+    )
+
+
+def generate_people(rng, count):
+    return [(i, make_name(rng)) for i in range(1, count + 1)]
+
+
+def generate_films(cur, rng, count, actors, directors, genres, countries, chunk_size=20000):
+    actor_weights = zipf_weights(len(actors))
+    director_weights = zipf_weights(len(directors))
+    rare_countries = [c for c in countries if c not in COMMON_COUNTRIES]
+
+    for start in range(1, count + 1, chunk_size):
+        films = []
+        film_actors = []
+        film_directors = []
+        for film_id in range(start, min(start + chunk_size, count + 1)):
+            cast = {a[0]: a for a in rng.choices(actors, cum_weights=actor_weights, k=rng.randint(3, 12))}
+            crew = {d[0]: d for d in rng.choices(directors, cum_weights=director_weights, k=rng.choice([1, 1, 1, 2]))}
+            film_countries = [rng.choice(COMMON_COUNTRIES) if rng.random() < 0.7 else rng.choice(rare_countries)]
+            if rng.random() < 0.2:
+                film_countries.append(rng.choice(COMMON_COUNTRIES))
+            rating_count = int(rng.lognormvariate(5, 2))
+            title = make_name(rng)
+            slug = f"synthetic-{film_id}"
+            films.append((
+                film_id,
+                title,
+                str(rng.randint(1920, 2025)),
+                json.dumps([{"name": d[1], "id": slugify(d[1], d[0])} for d in crew.values()]),
+                json.dumps([{"name": a[1], "id": slugify(a[1], a[0])} for a in cast.values()]),
+                json.dumps([]),
+                rng.sample(genres, rng.randint(1, 3)),
+                sorted(set(film_countries)),
+                round(min(5.0, max(0.5, rng.gauss(3.2, 0.5))), 2) if rating_count >= 10 else None,
+                rating_count,
+                rating_count // 8,
+                f"A synthetic film called {title}.",
+                f"https://letterboxd.com/film/{slug}/",
+                f"https://a.ltrbxd.com/resized/film-poster/{slug}-0-230-0-345-crop.jpg",
+            ))
+            film_actors.extend((film_id, actor_id) for actor_id in cast)
+            film_directors.extend((film_id, director_id) for director_id in crew)
+
+        copy_rows(
+            cur,
+            "films",
+            ["id", "title", "year", "directors", "actors", "studios", "genres", "countries",
+             "rating", "rating_count", "review_count", "description", "url", "image"],
+            films,
+        )
+        copy_rows(cur, "film_actors", ["film_id", "actor_id"], film_actors)
+        copy_rows(cur, "film_directors", ["film_id", "director_id"], film_directors)
+        print(f"  films {min(start + chunk_size - 1, count)}/{count}", file=sys.stderr)
+
+
+def rate(rng):
+    return rng.randint(1, 10) / 2 if rng.random() < 0.6 else None
+
+
+def generate_profiles(cur, rng, count, film_count, max_snapshots=6):
+    # Each user is scraped on a few days within the last month. Every scrape
+    # logs some new films, re-rates a few and occasionally drops one, so the
+    # history endpoints replay real profile_events rather than a single
+    # snapshot.
+    profiles = []
+    history = []
+    current = []
+    latest = []
+    today = date.today()
+    film_weights = zipf_weights(film_count, s=0.8)
+    profile_id = 0
+    for user_id in range(1, count + 1):
+        username = f"bench_user_{user_id}"
+        logged = min(film_count, int(rng.lognormvariate(6.5, 1)))
+        film_ids = set(rng.choices(range(1, film_count + 1), cum_weights=film_weights, k=logged))
+        state = {}
+        snapshot = {f"synthetic-{film_id}": rate(rng) for film_id in film_ids}
+        days = sorted(rng.sample(range(31), rng.randint(2, max_snapshots)), reverse=True)
+        for i, days_ago in enumerate(days):
+            if i:
+                snapshot = dict(state)
+                new_ids = rng.choices(range(1, film_count + 1), cum_weights=film_weights, k=rng.randint(1, 15))
+                for film_id in new_ids:
+                    snapshot.setdefault(f"synthetic-{film_id}", rate(rng))
+                for slug in rng.sample(list(state), min(len(state), rng.randint(0, 5))):
+                    snapshot[slug] = rate(rng)
+                if state and rng.random() < 0.2:
+                    del snapshot[rng.choice(list(state))]
+            profile_id += 1
+            profiles.append((profile_id, username, today - timedelta(days=days_ago), len(snapshot)))
+            history.append((profile_id, diff_snapshot(state, snapshot)))
+            state = snapshot
+        latest.append((username, profile_id))
+        current.extend((username, slug, rating) for slug, rating in state.items())
+
+    copy_rows(cur, "profiles", ["id", "username", "scraped_date", "total_films"], profiles)
+    for snapshot_id, events in history:
+        write_events(cur, snapshot_id, events)
+    copy_rows(cur, "profile_current", ["username", "film_slug", "rating"], current)
+    copy_rows(cur, "profile_latest", ["username", "profile_id"], latest)
+    return len(profiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load a synthetic catalog and profiles into a local benchmark database."
+    )
+    parser.add_argument("--films", type=int, default=100_000)
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="drop existing benchmark tables first")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    genres, countries = load_filter_constants()
+
+    conn = psycopg2.connect(bench_database_url())
+    cur = conn.cursor()
+    started = time.perf_counter()
+
+    if args.reset:
+        reset(cur)
+    with open(os.path.join(BENCH_DIR, "schema.sql")) as f:
+        cur.execute(f.read())
+    ensure_schema(cur)
+    mark_schema_version(cur)
+
+    actors = generate_people(rng, max(100, args.films // 2))
+    directors = generate_people(rng, max(20, args.films // 10))
+    copy_rows(cur, "actors", ["id", "name"], actors)
+    copy_rows(cur, "directors", ["id", "name"], directors)
+    print(f"Loaded {len(actors)} actors, {len(directors)} directors", file=sys.stderr)
+
+    generate_films(cur, rng, args.films, actors, directors, genres, countries)
+    snapshots = generate_profiles(cur, rng, args.profiles, args.films)
+    print(f"Loaded {args.profiles} profiles, {snapshots} snapshots", file=sys.stderr)
+
+    for table in ("films", "actors", "directors", "profiles"):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+    cur.execute("REFRESH MATERIALIZED VIEW actor_film_counts")
+    cur.execute("REFRESH MATERIALIZED VIEW director_film_counts")
+    conn.commit()
+
+    conn.autocommit = True
+    cur.execute("ANALYZE")
+    cur.close()
+    conn.close()
+
+    print(
+        f"Done. {args.films} films, {args.profiles} profiles in {time.perf_counter() - started:.0f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
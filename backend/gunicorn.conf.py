@@ -0,0 +1,34 @@
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 10000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+
+# PRELOAD=1 imports the app and builds the read-mostly caches once in the
+# master; workers then share those pages copy-on-write. Otherwise each worker
+# warms up on its own before it accepts requests.
+preload_app = os.getenv("PRELOAD", "0") == "1"
+warmup_enabled = os.getenv("WARMUP", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app and warmup_enabled:
+        from app import warmup
+
+        server.log.info("Master warmup took %d ms", warmup())
+        # Keep the garbage collector from touching (and so copying) the
+        # warmed objects in every worker.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+
+    reset_after_fork()
+
+
+def post_worker_init(worker):
+    if warmup_enabled and not preload_app:
+        from app import warmup
+
+        worker.log.info("Worker %s warmup took %d ms", worker.pid, warmup())
@@ -0,0 +1,112 @@
+import os
+import sys
+
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+sys.path.insert(0, os.path.dirname(__file__))
+from profile_store import (
+    apply_events,
+    diff_snapshot,
+    ensure_schema,
+    mark_schema_version,
+    point_latest,
+    write_events,
+)
+
+
+def compact_user(cur, username):
+    cur.execute(
+        "SELECT id FROM profiles WHERE username = %s ORDER BY scraped_date",
+        (username,),
+    )
+    profile_ids = [row[0] for row in cur.fetchall()]
+    if not profile_ids:
+        return 0, 0
+
+    state = {}
+    writer_state = {}
+    removed_rows = 0
+    for profile_id in profile_ids:
+        # A profile re-scraped on the same day after the event tables existed
+        # has both its old profile_films rows and newer events; the events,
+        # relative to whatever profile_current held before this user was
+        # compacted, are the later state.
+        cur.execute(
+            "SELECT film_slug, event, old_rating, new_rating FROM profile_events WHERE profile_id = %s ORDER BY id",
+            (profile_id,),
+        )
+        events = cur.fetchall()
+        cur.execute(
+            "SELECT film_slug, rating FROM profile_films WHERE profile_id = %s",
+            (profile_id,),
+        )
+        rows = cur.fetchall()
+        if events or not rows:
+            snapshot = dict(apply_events(writer_state, events))
+        else:
+            snapshot = dict(rows)
+
+        cur.execute("DELETE FROM profile_events WHERE profile_id = %s", (profile_id,))
+        write_events(cur, profile_id, diff_snapshot(state, snapshot))
+        cur.execute("DELETE FROM profile_films WHERE profile_id = %s", (profile_id,))
+        removed_rows += cur.rowcount
+        state = snapshot
+
+    cur.execute("DELETE FROM profile_current WHERE username = %s", (username,))
+    if state:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO profile_current (username, film_slug, rating) VALUES %s",
+            [(username, slug, rating) for slug, rating in state.items()],
+        )
+    point_latest(cur, username, profile_ids[-1])
+
+    return len(profile_ids), removed_rows
+
+
+conn = psycopg2.connect(os.environ["DATABASE_URL"])
+cur = conn.cursor()
+ensure_schema(cur)
+conn.commit()
+
+usernames = sys.argv[1:]
+if not usernames:
+    cur.execute(
+        """
+        SELECT DISTINCT p.username
+        FROM profiles p
+        WHERE EXISTS (SELECT 1 FROM profile_films pf WHERE pf.profile_id = p.id)
+        ORDER BY p.username
+        """
+    )
+    usernames = [row[0] for row in cur.fetchall()]
+
+print(f"Compacting {len(usernames)} profiles...", file=sys.stderr)
+
+total_removed = 0
+failed = 0
+for username in usernames:
+    try:
+        snapshots, removed_rows = compact_user(cur, username)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        failed += 1
+        print(f"{username}: FAILED - {e}", file=sys.stderr)
+        continue
+    total_removed += removed_rows
+    print(f"{username}: {snapshots} snapshots, {removed_rows} profile_films rows removed", file=sys.stderr)
+
+if not sys.argv[1:] and not failed:
+    mark_schema_version(cur)
+    conn.commit()
+else:
+    print("Schema not marked as migrated; rerun without usernames once every profile compacts.", file=sys.stderr)
+
+cur.close()
+conn.close()
+print(f"Done. Removed {total_removed} profile_films rows.", file=sys.stderr)
@@ -13,11 +13,10 @@ cur = conn.cursor()
 
 cur.execute(
     """
-    SELECT id, total_films, scraped_date
-    FROM profiles
-    WHERE username = %s
-    ORDER BY scraped_date DESC
-    LIMIT 1
+    SELECT p.total_films, p.scraped_date
+    FROM profile_latest l
+    JOIN profiles p ON p.id = l.profile_id
+    WHERE l.username = %s
     """,
     (username,),
 )
@@ -26,19 +25,19 @@ if not row:
     print(f"No profile found for '{username}'. Run profile_cli.py first.")
     sys.exit(1)
 
-profile_id, total_films, scraped_date = row
+total_films, scraped_date = row
 print(f"Profile: {username}  |  Films: {total_films}  |  Scraped: {scraped_date}\n")
 
 cur.execute(
     """
-    SELECT pf.film_slug, pf.rating, f.title, f.rating AS db_rating
-    FROM profile_films pf
-    JOIN films f ON f.url = 'https://letterboxd.com/film/' || pf.film_slug || '/'
-    WHERE pf.profile_id = %s
-      AND pf.rating IS NOT NULL
+    SELECT pc.film_slug, pc.rating, f.title, f.rating AS db_rating
+    FROM profile_current pc
+    JOIN films f ON f.url = 'https://letterboxd.com/film/' || pc.film_slug || '/'
+    WHERE pc.username = %s
+      AND pc.rating IS NOT NULL
       AND f.rating IS NOT NULL
     """,
-    (profile_id,),
+    (username,),
 )
 rows = cur.fetchall()
 cur.close()
@@ -0,0 +1,224 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+
+# Actor/director filters matching at most this many films drive the query
+# through their posting lists (intersected when there are several); broader
+# ones become correlated EXISTS checks on the rows that remain.
+INTERSECT_MAX_CANDIDATES = 5000
+# When the estimated candidate count is at most this, the candidates are
+# counted exactly and sorted with ORDER BY RANDOM(). Above it, no count is run
+# and TABLESAMPLE BERNOULLI keeps each row independently, so only a sample
+# spread over the whole table is filtered and sorted.
+SORT_MAX_CANDIDATES = 20000
+OVERSAMPLE = 5
+
+QUANTILES = [i / 100 for i in range(101)]
+# Distinct filter shapes whose SQL is kept compiled.
+SQL_CACHE_SIZE = 512
+
+POSTING_CACHE_SIZE = 4096
+
+POSTINGS = {
+    "actor": """
+        SELECT fa.film_id
+        FROM film_actors fa
+        INNER JOIN actors a ON fa.actor_id = a.id
+        WHERE a.name = %s
+    """,
+    "director": """
+        SELECT fd.film_id
+        FROM film_directors fd
+        INNER JOIN directors d ON fd.director_id = d.id
+        WHERE d.name = %s
+    """,
+}
+
+PREDICATES = {
+    "actor": """
+        EXISTS (
+            SELECT 1
+            FROM film_actors fa
+            INNER JOIN actors a ON fa.actor_id = a.id
+            WHERE fa.film_id = films.id AND a.name = %s
+        )
+    """,
+    "director": """
+        EXISTS (
+            SELECT 1
+            FROM film_directors fd
+            INNER JOIN directors d ON fd.director_id = d.id
+            WHERE fd.film_id = films.id AND d.name = %s
+        )
+    """,
+    "genre_and": "genres @> %s",
+    "genre_or": "genres && %s",
+    "country": "countries @> %s",
+    "min_rating": "rating >= %s",
+    "max_rating": "rating <= %s",
+    "min_ratings": "rating_count >= %s",
+    "year_min": "CAST(year AS INT) >= %s",
+    "year_max": "CAST(year AS INT) <= %s",
+    "exclude": "NOT (id = ANY(%s))",
+}
+
+SCALAR_FILTERS = {
+    "min_rating": ("rating", ">="),
+    "max_rating": ("rating", "<="),
+    "min_ratings": ("rating_count", ">="),
+    "year_min": ("year", ">="),
+    "year_max": ("year", "<="),
+}
+
+COUNT_VIEWS = {"actor": "actor_film_counts", "director": "director_film_counts"}
+
+posting_counts = OrderedDict()
+posting_counts_lock = threading.Lock()
+
+
+def load_value_counts(cur):
+    counts = {}
+    for kind, column in (("genre", "genres"), ("country", "countries")):
+        cur.execute(f"SELECT v, COUNT(*) FROM films, unnest({column}) AS v GROUP BY v")
+        counts[kind] = dict(cur.fetchall())
+
+    cur.execute(
+        """
+        SELECT
+            percentile_disc(%(q)s::float8[]) WITHIN GROUP (ORDER BY rating),
+            percentile_disc(%(q)s::float8[]) WITHIN GROUP (ORDER BY rating_count),
+            percentile_disc(%(q)s::float8[]) WITHIN GROUP (ORDER BY CAST(year AS INT)),
+            COUNT(rating), COUNT(rating_count), COUNT(year), COUNT(*)
+        FROM films
+        """,
+        {"q": QUANTILES},
+    )
+    row = cur.fetchone()
+    total = row[6] or 1
+    counts["quantiles"] = {
+        column: (points or [], non_null / total)
+        for column, points, non_null in zip(("rating", "rating_count", "year"), row[:3], row[3:6])
+    }
+    with posting_counts_lock:
+        posting_counts.clear()
+    return counts
+
+
+def people_counts(cur, kind, names):
+    with posting_counts_lock:
+        counts = {n: posting_counts[(kind, n)] for n in names if (kind, n) in posting_counts}
+    missing = [n for n in names if n not in counts]
+    if missing:
+        cur.execute(
+            f"SELECT name, SUM(film_count) FROM {COUNT_VIEWS[kind]} WHERE name = ANY(%s) GROUP BY name",
+            (missing,),
+        )
+        found = dict(cur.fetchall())
+        with posting_counts_lock:
+            for name in missing:
+                counts[name] = posting_counts[(kind, name)] = int(found.get(name, 0))
+            while len(posting_counts) > POSTING_CACHE_SIZE:
+                posting_counts.popitem(last=False)
+    return counts
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def compile_shape(shape):
+    postings, predicates = shape
+    conditions = []
+    if postings:
+        conditions.append(
+            "id IN (" + " INTERSECT ".join(POSTINGS[kind] for kind in postings) + ")"
+        )
+    conditions += [PREDICATES[kind] for kind in predicates]
+    return " AND ".join(conditions)
+
+
+def scalar_fraction(quantiles, column, op, value):
+    points, non_null = quantiles[column]
+    if not points:
+        return non_null
+    if op == ">=":
+        share = (len(points) - bisect_left(points, value)) / len(points)
+    else:
+        share = bisect_right(points, value) / len(points)
+    return non_null * share
+
+
+def compile_filters(cur, filters, catalog):
+    total = catalog["film_count"]
+    value_counts = catalog["value_counts"]
+
+    people = []
+    for kind in ("actor", "director"):
+        names = list(dict.fromkeys(filters[kind + "s"]))
+        counts = people_counts(cur, kind, names) if names else {}
+        people += [(counts[name], kind, name) for name in names]
+    people.sort()
+
+    ranked = []
+    genres = filters["genres"]
+    if genres:
+        genre_counts = [value_counts["genre"].get(g, 0) for g in genres]
+        if filters["genre_mode"] == "or":
+            ranked.append((min(total, sum(genre_counts)), "genre_or", genres))
+        else:
+            ranked.append((min(genre_counts), "genre_and", genres))
+    countries = filters["countries"]
+    if countries:
+        ranked.append((min(value_counts["country"].get(c, 0) for c in countries), "country", countries))
+    ranked += [(count, kind, name) for count, kind, name in people]
+    ranked.sort(key=lambda p: p[0])
+
+    # Predicates are treated as independent, capped by the smallest
+    # posting list or array match.
+    estimate = float(total)
+    for count, _, _ in ranked:
+        estimate *= count / total if total else 0
+
+    drivers = [p for p in people if p[0] <= INTERSECT_MAX_CANDIDATES]
+    postings = tuple(kind for _, kind, _ in drivers)
+    params = [name for _, _, name in drivers]
+    ranked = [p for p in ranked if p not in drivers]
+
+    predicates = [kind for _, kind, _ in ranked]
+    params += [param for _, _, param in ranked]
+    for kind, (column, op) in SCALAR_FILTERS.items():
+        if filters.get(kind) is not None:
+            predicates.append(kind)
+            params.append(filters[kind])
+            estimate *= scalar_fraction(value_counts["quantiles"], column, op, filters[kind])
+    if filters.get("exclude"):
+        predicates.append("exclude")
+        params.append(filters["exclude"])
+        estimate *= max(0.0, 1 - len(filters["exclude"]) / total) if total else 0
+
+    return (postings, tuple(predicates)), params, math.ceil(estimate)
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def count_query(shape):
+    return "SELECT COUNT(*) FROM films WHERE " + compile_shape(shape)
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def sampling_sql(strategy, shape):
+    where = compile_shape(shape)
+    where_sql = " WHERE " + where if where else ""
+    if strategy == "all":
+        return "SELECT * FROM films" + where_sql
+    if strategy == "sort":
+        return "SELECT * FROM films" + where_sql + " ORDER BY RANDOM() LIMIT %s"
+    return "SELECT * FROM films TABLESAMPLE BERNOULLI (%s)" + where_sql + " ORDER BY RANDOM() LIMIT %s"
+
+
+def sampling_query(strategy, shape, params, estimate, limit):
+    sql = sampling_sql(strategy, shape)
+    if strategy == "all":
+        return sql, params
+    if strategy == "sort":
+        return sql, params + [limit]
+    percent = min(100.0, 100.0 * OVERSAMPLE * limit / max(estimate, 1))
+    return sql, [percent] + params + [limit]
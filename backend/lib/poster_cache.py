@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from io import BytesIO
+
+POSTER_SIZES = {"thumb": (72, 108), "card": (230, 345)}
+
+CACHE_DIR = os.getenv(
+    "POSTER_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".poster_cache")
+)
+CACHE_MAX_BYTES = int(os.getenv("POSTER_CACHE_MAX_MB", 512)) * 1024 * 1024
+# Evict down to this fraction of the limit so a full cache isn't rescanned on
+# every miss.
+EVICT_TO = 0.9
+# Every process writing to the cache rescans the directory after this many
+# writes, so the others' writes count towards the limit too.
+RESCAN_WRITES = 100
+
+VERSION_PATTERN = re.compile(r"[0-9a-f]{12}")
+
+cache_state = {"bytes": None, "writes": 0}
+cache_lock = threading.Lock()
+
+
+def poster_version(image_url):
+    return hashlib.sha1(image_url.encode()).hexdigest()[:12]
+
+
+def poster_path(film_id, version, size):
+    return os.path.join(CACHE_DIR, f"{film_id}-{version}-{size}.jpg")
+
+
+def cached_poster(film_id, version, size):
+    # Anything but a poster_version() hash is treated as a miss, so no other
+    # value ever reaches the filesystem.
+    if not VERSION_PATTERN.fullmatch(version):
+        return None
+    path = poster_path(film_id, version, size)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def fetch_poster(film_id, image_url):
+    import requests
+    from PIL import Image
+
+    response = requests.get(
+        image_url, headers={"User-Agent": "letterboxd-roulette/1.0"}, timeout=10
+    )
+    response.raise_for_status()
+    image = Image.open(BytesIO(response.content)).convert("RGB")
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    version = poster_version(image_url)
+    variants = {}
+    for size, dimensions in POSTER_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail(dimensions)
+        buffer = BytesIO()
+        variant.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+        variants[size] = buffer.getvalue()
+
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(variants[size])
+            os.replace(tmp_path, poster_path(film_id, version, size))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    record_write(sum(len(data) for data in variants.values()))
+    return variants
+
+
+def cache_size():
+    total = 0
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".jpg"):
+                total += entry.stat().st_size
+    return total
+
+
+def record_write(written):
+    with cache_lock:
+        cache_state["writes"] += 1
+        if cache_state["bytes"] is None or cache_state["writes"] % RESCAN_WRITES == 0:
+            cache_state["bytes"] = cache_size()
+        else:
+            cache_state["bytes"] += written
+        if cache_state["bytes"] > CACHE_MAX_BYTES:
+            cache_state["bytes"] = evict(int(CACHE_MAX_BYTES * EVICT_TO))
+
+
+def evict(target_bytes):
+    files = []
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".jpg"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
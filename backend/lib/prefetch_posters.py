@@ -0,0 +1,56 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+sys.path.insert(0, os.path.dirname(__file__))
+from poster_cache import POSTER_SIZES, fetch_poster, poster_path, poster_version
+
+WORKERS = 4
+
+start = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+conn = psycopg2.connect(os.environ["DATABASE_URL"])
+cur = conn.cursor()
+cur.execute(
+    "SELECT id, image FROM films WHERE id >= %s AND image IS NOT NULL ORDER BY id",
+    (start,),
+)
+films = [
+    (film_id, image)
+    for film_id, image in cur.fetchall()
+    if not all(
+        os.path.exists(poster_path(film_id, poster_version(image), size))
+        for size in POSTER_SIZES
+    )
+]
+cur.close()
+conn.close()
+
+total = len(films)
+print(f"Prefetching {total} posters...", file=sys.stderr)
+
+
+def prefetch(film):
+    film_id, image = film
+    try:
+        fetch_poster(film_id, image)
+        return None
+    except Exception as e:
+        return f"[{film_id}] ERROR: {image} - {e}"
+
+
+errors = []
+with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+    for i, error in enumerate(executor.map(prefetch, films), 1):
+        if error:
+            print(error, file=sys.stderr)
+            errors.append(error)
+        if i % 500 == 0:
+            print(f"[{i}/{total}] (last id {films[i - 1][0]})", file=sys.stderr)
+
+print(f"Done. Prefetched {total - len(errors)} posters. {len(errors)} errors.", file=sys.stderr)
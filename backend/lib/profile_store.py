@@ -0,0 +1,154 @@
+from datetime import date
+
+import psycopg2.extras
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_latest (
+    username TEXT PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS profile_current (
+    username TEXT NOT NULL,
+    film_slug TEXT NOT NULL,
+    rating REAL,
+    PRIMARY KEY (username, film_slug)
+);
+
+CREATE TABLE IF NOT EXISTS profile_events (
+    id SERIAL PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id),
+    film_slug TEXT NOT NULL,
+    event TEXT NOT NULL,
+    old_rating REAL,
+    new_rating REAL
+);
+
+CREATE INDEX IF NOT EXISTS profile_events_profile_id_idx ON profile_events (profile_id);
+
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER NOT NULL
+);
+"""
+# Bumped whenever SCHEMA or the compaction changes; the app refuses to serve
+# profiles until compact_profiles.py has recorded this version.
+SCHEMA_VERSION = 1
+
+ADDED = "added"
+REMOVED = "removed"
+RATING_CHANGED = "rating_changed"
+
+
+def ensure_schema(cur):
+    cur.execute(SCHEMA)
+
+
+def mark_schema_version(cur):
+    cur.execute("DELETE FROM schema_version")
+    cur.execute("INSERT INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,))
+
+
+def check_schema(cur):
+    cur.execute("SELECT to_regclass('schema_version')")
+    version = None
+    if cur.fetchone()[0] is not None:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+        version = cur.fetchone()[0]
+    if version is None or version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}. "
+            "Run python backend/lib/compact_profiles.py before starting the app."
+        )
+
+
+def diff_snapshot(current, snapshot):
+    events = []
+    for slug, rating in snapshot.items():
+        if slug not in current:
+            events.append((slug, ADDED, None, rating))
+        elif current[slug] != rating:
+            events.append((slug, RATING_CHANGED, current[slug], rating))
+    for slug, rating in current.items():
+        if slug not in snapshot:
+            events.append((slug, REMOVED, rating, None))
+    return events
+
+
+def apply_events(state, events):
+    for slug, event, _, new_rating in events:
+        if event == REMOVED:
+            state.pop(slug, None)
+        else:
+            state[slug] = new_rating
+    return state
+
+
+def load_current(cur, username):
+    cur.execute(
+        "SELECT film_slug, rating FROM profile_current WHERE username = %s",
+        (username,),
+    )
+    return dict(cur.fetchall())
+
+
+def write_events(cur, profile_id, events):
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO profile_events (profile_id, film_slug, event, old_rating, new_rating) VALUES %s",
+        [(profile_id, *e) for e in events],
+    )
+
+
+def write_current(cur, username, events):
+    removed = [slug for slug, event, _, _ in events if event == REMOVED]
+    if removed:
+        cur.execute(
+            "DELETE FROM profile_current WHERE username = %s AND film_slug = ANY(%s)",
+            (username, removed),
+        )
+    upserts = [(username, slug, rating) for slug, event, _, rating in events if event != REMOVED]
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO profile_current (username, film_slug, rating) VALUES %s
+        ON CONFLICT (username, film_slug) DO UPDATE SET rating = EXCLUDED.rating
+        """,
+        upserts,
+    )
+
+
+def point_latest(cur, username, profile_id):
+    cur.execute(
+        """
+        INSERT INTO profile_latest (username, profile_id) VALUES (%s, %s)
+        ON CONFLICT (username) DO UPDATE SET profile_id = EXCLUDED.profile_id, updated_at = now()
+        """,
+        (username, profile_id),
+    )
+
+
+def save_snapshot(cur, username, total_films, movies):
+    cur.execute(
+        "SELECT id FROM profiles WHERE username = %s AND scraped_date = %s",
+        (username, date.today()),
+    )
+    existing = cur.fetchone()
+
+    if existing:
+        profile_id = existing[0]
+        cur.execute("UPDATE profiles SET total_films = %s WHERE id = %s", (total_films, profile_id))
+    else:
+        cur.execute(
+            "INSERT INTO profiles (username, scraped_date, total_films) VALUES (%s, %s, %s) RETURNING id",
+            (username, date.today(), total_films),
+        )
+        profile_id = cur.fetchone()[0]
+
+    snapshot = {m["film"]: m["rating"] for m in movies}
+    events = diff_snapshot(load_current(cur, username), snapshot)
+    write_events(cur, profile_id, events)
+    write_current(cur, username, events)
+    point_latest(cur, username, profile_id)
+
+    return profile_id, len(events)
@@ -0,0 +1,47 @@
+import math
+from itertools import combinations
+
+# Below this many co-rated films the scores are noise (Pearson over two films
+# is always +/-1), so they are not reported.
+MIN_CO_RATED = 5
+
+
+def _co_rated(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return [(r, b[slug]) for slug, r in a.items() if slug in b]
+
+
+def cosine(pairs):
+    dot = sum(x * y for x, y in pairs)
+    norm_x = math.sqrt(sum(x * x for x, _ in pairs))
+    norm_y = math.sqrt(sum(y * y for _, y in pairs))
+    if not norm_x or not norm_y:
+        return None
+    return dot / (norm_x * norm_y)
+
+
+def pearson(pairs):
+    n = len(pairs)
+    if n < 2:
+        return None
+    mean_x = sum(x for x, _ in pairs) / n
+    mean_y = sum(y for _, y in pairs) / n
+    return cosine([(x - mean_x, y - mean_y) for x, y in pairs])
+
+
+def pairwise_similarity(ratings):
+    results = []
+    for user_a, user_b in combinations(sorted(ratings), 2):
+        pairs = _co_rated(ratings[user_a], ratings[user_b])
+        enough = len(pairs) >= MIN_CO_RATED
+        cos = cosine(pairs) if enough else None
+        corr = pearson(pairs) if enough else None
+        results.append({
+            "users": [user_a, user_b],
+            "co_rated": len(pairs),
+            "cosine": round(cos, 4) if cos is not None else None,
+            "pearson": round(corr, 4) if corr is not None else None,
+        })
+    results.sort(key=lambda r: (r["pearson"] is None, -(r["pearson"] or 0)))
+    return results
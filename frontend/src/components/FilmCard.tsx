@@ -8,7 +8,14 @@ export default function FilmCard({ film }: FilmCardProps) {
   return (
     <div className="bg-zinc-900 border border-zinc-800 rounded-xl p-5 max-w-2xl w-full flex flex-col sm:flex-row gap-5">
       <img
-        src={film.image}
+        src={
+          film.poster_version
+            ? `${import.meta.env.VITE_API_URL}/films/${film.id}/poster?size=card&v=${film.poster_version}`
+            : film.image
+        }
+        onError={(e) => {
+          if (e.currentTarget.src !== film.image) e.currentTarget.src = film.image;
+        }}
         alt={film.title}
         className="w-48 sm:w-45 h-auto rounded-lg shadow-lg shrink-0 self-center sm:self-start"
       />
@@ -198,6 +198,17 @@ export default function FilterPanel({ filters, setFilters }: FilterPanelProps) {
       >
         View all available countries
       </a>
+
+      <label className="flex flex-col gap-1 text-sm text-zinc-400">
+        Exclude Films Watched By
+        <input
+          type="text"
+          placeholder="Letterboxd username"
+          value={filters.username}
+          onChange={(e) => updateField("username", e.target.value.trim())}
+          className="bg-zinc-900 border border-zinc-700 rounded-lg px-3 py-2 text-base text-zinc-100 focus:outline-none focus:border-emerald-500 transition"
+        />
+      </label>
     </div>
   );
 }
@@ -16,6 +16,7 @@ export default function Roulette() {
     countries: [],
     actors: [],
     directors: [],
+    username: "",
   });
   const [films, setFilms] = useState<Film[]>([]);
   const [selectedFilm, setSelectedFilm] = useState<Film | null>(null);
@@ -48,13 +49,21 @@ export default function Roulette() {
       filters.countries.forEach((c) => params.append("country", c));
       filters.actors.forEach((a) => params.append("actor", a));
       filters.directors.forEach((d) => params.append("director", d));
+      if (filters.username) params.append("username", filters.username);
       params.append("limit", "50");
 
       const res = await fetch(
         `${import.meta.env.VITE_API_URL}/films/random?${params}`,
       );
       if (!res.ok) {
-        setError("No films match those filters. Try broadening your search.");
+        const body = await res.json().catch(() => null);
+        if (body?.error === "User not found") {
+          setError(
+            `No imported profile for ${filters.username}. Import it on the SignalScore page first.`,
+          );
+        } else {
+          setError("No films match those filters. Try broadening your search.");
+        }
         return;
       }
       const data: Film[] = await res.json();
@@ -13,6 +13,7 @@ export interface Film {
   description: string;
   url: string;
   image: string;
+  poster_version: string | null;
 }
 
 export interface Filters {
@@ -26,4 +27,5 @@ export interface Filters {
   countries: string[];
   actors: string[];
   directors: string[];
+  username: string;
 }